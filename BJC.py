@@ -1,167 +1,316 @@
+import functools
+
+import numpy as np
 import streamlit as st
-import random
 
 # Define suits and ranks for cards
 suits = ["Hearts", "Diamonds", "Clubs", "Spades"]
 ranks = ["2", "3", "4", "5", "6", "7", "8", "9", "10", "J", "Q", "K", "A"]
 
+# Blackjack value of each rank, counting aces as 11
+_RANK_VALUES = {rank: int(rank) for rank in ranks[:9]}
+_RANK_VALUES.update({"J": 10, "Q": 10, "K": 10, "A": 11})
+
+# Cards are integer ids 0-51: suit is id // 13, rank is id % 13.
+# Their blackjack values and display names are looked up by id, built once
+# per process.
+_DECK_SIZE = len(suits) * len(ranks)
+_CARD_VALUES = tuple(_RANK_VALUES[rank] for suit in suits for rank in ranks)
+_CARD_NAMES = tuple(f"{rank} of {suit}" for suit in suits for rank in ranks)
+_RNG = np.random.default_rng()
+
+# The deck carries over between hands until fewer cards than this remain
+RESHUFFLE_THRESHOLD = 15
+
+def new_deck():
+    """Return a freshly shuffled deck of card ids."""
+    return _RNG.permutation(_DECK_SIZE).tolist()
+
 # Functions for card and hand handling
 def card_to_str(card):
-    """Convert a card tuple to a string."""
-    return f"{card[1]} of {card[0]}"
+    """Convert a card id to a string."""
+    return _CARD_NAMES[card]
+
+@functools.lru_cache(maxsize=1024)
+def _hand_str(hand):
+    """Format a hand given as a tuple of card ids, memoized across reruns."""
+    return ", ".join([_CARD_NAMES[card] for card in hand])
 
 def hand_to_str(hand):
-    """Convert a hand (list of card tuples) to a string."""
-    return ", ".join(card_to_str(card) for card in hand)
+    """Convert a hand (list of card ids) to a string."""
+    return _hand_str(tuple(hand))
 
-def calculate_hand_value(hand):
-    """Calculate the total value of a hand, adjusting for aces."""
+@functools.lru_cache(maxsize=256)
+def format_money(amount):
+    """Format a dollar amount for display, memoized across reruns."""
+    return f"${amount:,.2f}"
+
+def _soften_aces(value, aces):
+    """Count just enough aces as 1 instead of 11 to get value to 21 or under.
+
+    Returns the adjusted (value, soft_aces) in closed form rather than
+    stepping down one ace at a time.
+    """
+    if value <= 21:
+        return value, aces
+    hardened = min(aces, (value - 12) // 10)  # ceil((value - 21) / 10)
+    return value - 10 * hardened, aces - hardened
+
+def _hand_sum_and_aces(hand):
+    """Return (value, soft_aces) for a hand in a single pass.
+
+    soft_aces is the number of aces still counted as 11 after adjusting.
+    """
     value = 0
     aces = 0
     for card in hand:
-        rank = card[1]
-        if rank in ("J", "Q", "K"):
-            value += 10
-        elif rank == "A":
+        card_value = _CARD_VALUES[card]
+        value += card_value
+        if card_value == 11:
             aces += 1
-            value += 11
-        else:
-            value += int(rank)
-    while value > 21 and aces:
-        value -= 10
-        aces -= 1
+    return _soften_aces(value, aces)
+
+def calculate_hand_value(hand):
+    """Calculate the total value of a hand, adjusting for aces."""
+    return _hand_sum_and_aces(hand)[0]
+
+def _add_card_value(value, aces, card):
+    """Add one card to a running (value, soft_aces) total."""
+    card_value = _CARD_VALUES[card]
+    value += card_value
+    if card_value == 11:
+        aces += 1
+    return _soften_aces(value, aces)
+
+def shuffle_if_low():
+    """Start a freshly shuffled deck if the current one is running low."""
+    if _DECK_SIZE - st.session_state.deck_idx < RESHUFFLE_THRESHOLD:
+        st.session_state.deck = new_deck()
+        st.session_state.deck_idx = 0
+
+def draw_card():
+    """Take the next card from the deck by advancing the deck cursor."""
+    i = st.session_state.deck_idx
+    if i == _DECK_SIZE:
+        # An unusually long hand used up the deck mid-round
+        st.session_state.deck = new_deck()
+        i = 0
+    st.session_state.deck_idx = i + 1
+    return st.session_state.deck[i]
+
+def draw_cards(n):
+    """Take the next n cards from the deck with one slice."""
+    i = st.session_state.deck_idx
+    if _DECK_SIZE - i < n:
+        st.session_state.deck = new_deck()
+        i = 0
+    st.session_state.deck_idx = i + n
+    return st.session_state.deck[i:i + n]
+
+def deal_card(owner):
+    """Deal the top card to 'player' or 'dealer' and return the new hand value.
+
+    The hand's total and soft-ace count are kept in session state and updated
+    by the dealt card alone, so the hand is never rescanned.
+    """
+    card = draw_card()
+    st.session_state[f"{owner}_hand"].append(card)
+    value, aces = _add_card_value(
+        st.session_state[f"{owner}_value"], st.session_state[f"{owner}_aces"], card
+    )
+    st.session_state[f"{owner}_value"] = value
+    st.session_state[f"{owner}_aces"] = aces
     return value
 
+def play_dealer():
+    """Draw for the dealer until the hand reaches 17 or more.
+
+    Works on local references and writes the totals back once at the end.
+    """
+    deck = st.session_state.deck
+    deck_idx = st.session_state.deck_idx
+    hand = st.session_state.dealer_hand
+    value = st.session_state.dealer_value
+    aces = st.session_state.dealer_aces
+    while value < 17:
+        if deck_idx == _DECK_SIZE:
+            deck = st.session_state.deck = new_deck()
+            deck_idx = 0
+        card = deck[deck_idx]
+        deck_idx += 1
+        hand.append(card)
+        value, aces = _add_card_value(value, aces, card)
+    st.session_state.deck_idx = deck_idx
+    st.session_state.dealer_value = value
+    st.session_state.dealer_aces = aces
+
+# Starting value of every game field kept in session state
+_DEFAULTS = {
+    'game_phase': 'start',
+    'player_money': 500.00,
+    'dealer_money': 5000000.00,
+    'deck': [],
+    'deck_idx': _DECK_SIZE,  # no deck yet, so treat it as fully dealt
+    'player_hand': [],
+    'dealer_hand': [],
+    'player_value': 0,
+    'player_aces': 0,
+    'dealer_value': 0,
+    'dealer_aces': 0,
+    'dealer_visible': "",
+    'bet': 0.0,
+    'message': "",
+    'result_processed': False,
+}
+
+# Fields cleared before every new hand
+_HAND_KEYS = (
+    'player_hand', 'dealer_hand',
+    'player_value', 'player_aces', 'dealer_value', 'dealer_aces',
+    'dealer_visible', 'bet', 'result_processed',
+)
+
+def _default(key):
+    """Return the default for a field, copying lists so sessions never share one."""
+    value = _DEFAULTS[key]
+    return value.copy() if isinstance(value, list) else value
+
+def _reset_state(keys=_DEFAULTS):
+    """Restore the given session state fields to their defaults."""
+    st.session_state.update({key: _default(key) for key in keys})
+
 # Initialize session state
 def initialize_session_state():
-    """Set up initial game state if not already present."""
-    if 'game_phase' not in st.session_state:
-        st.session_state.game_phase = 'start'
-        st.session_state.player_money = 500.00
-        st.session_state.dealer_money = 5000000.00
-        st.session_state.deck = []
-        st.session_state.player_hand = []
-        st.session_state.dealer_hand = []
-        st.session_state.bet = 0.0
-        st.session_state.message = ""
-        st.session_state.result_processed = False  # Initialize result_processed flag
+    """Set up initial game state for any field not already present."""
+    for key in _DEFAULTS:
+        if key not in st.session_state:
+            st.session_state[key] = _default(key)
 
-# Main application logic
-initialize_session_state()
+# Button callbacks. Streamlit runs these before the script reruns, so the
+# new phase renders in that same pass without an extra st.rerun().
+def reset_game():
+    """Return every game value to its starting state."""
+    _reset_state()
 
-# Sidebar for money display, reset, and quit
-with st.sidebar:
-    st.header("Balances")
-    st.metric("Your Money", f"${st.session_state.player_money:.2f}")
-    st.metric("Casino Money", f"${st.session_state.dealer_money:.2f}")
-    st.divider()
-    if st.button("Reset Game"):
-        st.session_state.game_phase = 'start'
-        st.session_state.player_money = 500.00
-        st.session_state.dealer_money = 5000000.00
-        st.session_state.deck = []
-        st.session_state.player_hand = []
-        st.session_state.dealer_hand = []
-        st.session_state.bet = 0.0
-        st.session_state.message = ""
-        st.session_state.result_processed = False  # Reset flag
-        st.rerun()
-    if st.button("Quit"):
-        st.session_state.game_phase = 'quit'
-        st.rerun()
+def quit_game():
+    st.session_state.game_phase = 'quit'
 
-# Main game area
-st.title("🎲 Blackjack")
-st.write("Welcome to Blackjack! Beat the dealer without going over 21.")
+def start_game():
+    st.session_state.game_phase = 'betting'
+    shuffle_if_low()
+
+def place_bet():
+    """Deal a new hand for the bet entered, or flag a bet over the balance."""
+    bet = st.session_state.bet_input
+    if bet > st.session_state.player_money:
+        st.session_state.bet_error = True
+        return
+    cards = draw_cards(4)
+    player_hand, dealer_hand = cards[:2], cards[2:]
+    player_value, player_aces = _hand_sum_and_aces(player_hand)
+    dealer_value, dealer_aces = _hand_sum_and_aces(dealer_hand)
+    # Every _HAND_KEYS field is set here, so no separate reset is needed
+    st.session_state.update({
+        'game_phase': 'player_turn',
+        'bet': bet,
+        'player_hand': player_hand,
+        'dealer_hand': dealer_hand,
+        'player_value': player_value,
+        'player_aces': player_aces,
+        'dealer_value': dealer_value,
+        'dealer_aces': dealer_aces,
+        'dealer_visible': card_to_str(dealer_hand[0]),
+        'result_processed': False,
+    })
+
+def hit():
+    if deal_card('player') > 21:
+        st.session_state.game_phase = 'result'
 
-phase = st.session_state.game_phase
+def stand():
+    st.session_state.game_phase = 'dealer_turn'
 
-if phase == 'quit':
+def play_again():
+    st.session_state.game_phase = 'betting'
+    shuffle_if_low()
+    _reset_state(_HAND_KEYS)
+
+# Screen for each game phase
+def render_quit():
+    """Show the goodbye screen."""
     st.write("Thanks for playing!")
     st.stop()
 
-elif phase == 'start':
+def render_start():
+    """Show the start screen."""
     st.header("Start Game")
     st.info("Click 'Play' to begin.")
-    if st.button("Play"):
-        st.session_state.game_phase = 'betting'
-        st.session_state.deck = [(suit, rank) for suit in suits for rank in ranks]
-        random.shuffle(st.session_state.deck)
-        st.rerun()
+    st.button("Play", on_click=start_game)
 
-elif phase == 'betting':
+def render_betting():
+    """Show the bet entry screen."""
     st.header("Place Your Bet")
     st.info("Enter your bet amount and click 'Place Bet' to start.")
-    bet = st.number_input("Enter your bet", min_value=0.01, step=0.01, value=0.01)
-    if st.button("Place Bet"):
-        if bet > st.session_state.player_money:
-            st.error("Bet exceeds balance. Place another.")
-        else:
-            st.session_state.bet = bet
-            st.session_state.player_hand = [st.session_state.deck.pop(), st.session_state.deck.pop()]
-            st.session_state.dealer_hand = [st.session_state.deck.pop(), st.session_state.deck.pop()]
-            st.session_state.game_phase = 'player_turn'
-            st.session_state.result_processed = False  # Reset for new hand
-            st.rerun()
-
-elif phase == 'player_turn':
+    st.number_input("Enter your bet", min_value=0.01, step=0.01, value=0.01, key='bet_input')
+    st.button("Place Bet", on_click=place_bet)
+    if st.session_state.pop('bet_error', False):
+        st.error("Bet exceeds balance. Place another.")
+
+@st.fragment
+def render_player_turn():
+    """Show the player's hand with Hit and Stand.
+
+    Runs as a fragment so a Hit redraws only this panel; once Hit busts or
+    Stand is pressed the whole page reruns for the next phase.
+    """
+    if st.session_state.game_phase != 'player_turn':
+        st.rerun()
     st.header("Your Turn")
     st.info("Hit to take another card, or Stand to end your turn.")
+    player_value = st.session_state.player_value
     col1, col2 = st.columns(2)
     with col1:
-        st.markdown("**Your Hand:**")
-        st.write(hand_to_str(st.session_state.player_hand))
-        st.markdown(f"**Value:** {calculate_hand_value(st.session_state.player_hand)}")
+        st.markdown(
+            f"**Your Hand:**\n\n{hand_to_str(st.session_state.player_hand)}\n\n"
+            f"**Value:** {player_value}"
+        )
     with col2:
-        st.markdown("**Dealer Hand:**")
-        st.write(f"{card_to_str(st.session_state.dealer_hand[0])}, [Hidden]")
-    st.markdown(f"**Current Bet:** ${st.session_state.bet:.2f}")
+        st.markdown(f"**Dealer Hand:**\n\n{st.session_state.dealer_visible}, [Hidden]")
+    st.markdown(f"**Current Bet:** {format_money(st.session_state.bet)}")
     col3, col4 = st.columns(2)
     with col3:
-        if st.button("Hit"):
-            st.session_state.player_hand.append(st.session_state.deck.pop())
-            if calculate_hand_value(st.session_state.player_hand) > 21:
-                st.session_state.game_phase = 'result'
-            st.rerun()
+        st.button("Hit", on_click=hit)
     with col4:
-        if st.button("Stand"):
-            st.session_state.game_phase = 'dealer_turn'
-            st.rerun()
-
-elif phase == 'dealer_turn':
-    while calculate_hand_value(st.session_state.dealer_hand) < 17:
-        st.session_state.dealer_hand.append(st.session_state.deck.pop())
-    st.session_state.game_phase = 'result'
-    st.rerun()
+        st.button("Stand", on_click=stand)
 
-elif phase == 'result':
+def render_result():
+    """Settle the bet once and show the outcome."""
     st.header("Game Result")
+    player_value = st.session_state.player_value
+    dealer_value = st.session_state.dealer_value
     if not st.session_state.result_processed:
-        player_value = calculate_hand_value(st.session_state.player_hand)
-        dealer_value = calculate_hand_value(st.session_state.dealer_hand)
+        bet = st.session_state.bet
         if player_value > 21:
-            st.session_state.message = "You busted! You lose."
-            st.session_state.dealer_money += st.session_state.bet
-            st.session_state.player_money -= st.session_state.bet
+            message, delta = "You busted! You lose.", -bet
         elif dealer_value > 21:
-            st.session_state.message = "Dealer busted! You win."
-            st.session_state.player_money += st.session_state.bet
-            st.session_state.dealer_money -= st.session_state.bet
+            message, delta = "Dealer busted! You win.", bet
         elif player_value > dealer_value:
-            st.session_state.message = "You win!"
-            st.session_state.player_money += st.session_state.bet
-            st.session_state.dealer_money -= st.session_state.bet
+            message, delta = "You win!", bet
         elif dealer_value > player_value:
-            st.session_state.message = "You lose!"
-            st.session_state.dealer_money += st.session_state.bet
-            st.session_state.player_money -= st.session_state.bet
+            message, delta = "You lose!", -bet
         else:
-            st.session_state.message = "Push!"
+            message, delta = "Push!", 0.0
+        # delta is the player's winnings; the casino always takes the other side
+        st.session_state.message = message
+        st.session_state.player_money += delta
+        st.session_state.dealer_money -= delta
         st.session_state.result_processed = True  # Mark result as processed
     # Display game state
-    st.markdown(f"**Your Hand:** {hand_to_str(st.session_state.player_hand)} (Value: {calculate_hand_value(st.session_state.player_hand)})")
-    st.markdown(f"**Dealer Hand:** {hand_to_str(st.session_state.dealer_hand)} (Value: {calculate_hand_value(st.session_state.dealer_hand)})")
-    st.markdown(f"### {st.session_state.message}")
+    st.markdown(
+        f"**Your Hand:** {hand_to_str(st.session_state.player_hand)} (Value: {player_value})\n\n"
+        f"**Dealer Hand:** {hand_to_str(st.session_state.dealer_hand)} (Value: {dealer_value})\n\n"
+        f"### {st.session_state.message}"
+    )
     # Check game over conditions
     if st.session_state.player_money <= 0:
         st.error("Too Bad! No money left.")
@@ -170,12 +319,36 @@ elif phase == 'result':
         st.success("Casino Bankrupt!")
         st.stop()
     else:
-        if st.button("Play Again"):
-            st.session_state.game_phase = 'betting'
-            st.session_state.deck = [(suit, rank) for suit in suits for rank in ranks]
-            random.shuffle(st.session_state.deck)
-            st.session_state.player_hand = []
-            st.session_state.dealer_hand = []
-            st.session_state.bet = 0.0
-            st.session_state.result_processed = False  # Reset for new hand
-            st.rerun()
+        st.button("Play Again", on_click=play_again)
+
+_PHASES = {
+    'quit': render_quit,
+    'start': render_start,
+    'betting': render_betting,
+    'player_turn': render_player_turn,
+    'result': render_result,
+}
+
+# Main application logic
+initialize_session_state()
+
+# The dealer's turn has no screen of its own: play it out before anything is
+# drawn so this run renders the result directly.
+if st.session_state.game_phase == 'dealer_turn':
+    play_dealer()
+    st.session_state.game_phase = 'result'
+
+# Sidebar for money display, reset, and quit
+with st.sidebar:
+    st.header("Balances")
+    st.metric("Your Money", format_money(st.session_state.player_money))
+    st.metric("Casino Money", format_money(st.session_state.dealer_money))
+    st.divider()
+    st.button("Reset Game", on_click=reset_game)
+    st.button("Quit", on_click=quit_game)
+
+# Main game area
+st.title("🎲 Blackjack")
+st.write("Welcome to Blackjack! Beat the dealer without going over 21.")
+
+_PHASES.get(st.session_state.game_phase, render_start)()